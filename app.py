@@ -1,16 +1,23 @@
 import streamlit as st
-import google.generativeai as genai
+import diskcache
 import os
 import logging
-from pygments.lexers import guess_lexer
-from pygments.util import ClassNotFound
+import hashlib
+import collections
+import itertools
+import asyncio
+import functools
+from dataclasses import dataclass
 from datetime import datetime
-import io
-import tempfile
-import zipfile
-from typing import Optional, Tuple
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 import time
-import json
+import uuid
+import zlib
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -37,118 +44,258 @@ st.set_page_config(
 )
 
 # Custom CSS for professional styling
-st.markdown("""
-<style>
-    .main > div {
-        padding-top: 2rem;
-    }
-    .block-container {
-  background-color: #e0e4ea;
-}
-
-
-
-    .stAlert {
-        border-radius: 10px;
-        border-left: 4px solid #2563eb;
-    }
-
-    .success-alert {
-        border-left: 4px solid #059669 !important;
-        background-color: #ecfdf5;
-    }
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "style.css")
 
-    .error-alert {
-        border-left: 4px solid #dc2626 !important;
-        background-color: #fef2f2;
-    }
 
-    .info-alert {
-        border-left: 4px solid #2563eb !important;
-        background-color: #eff6ff;
-    }
+@st.cache_resource(show_spinner=False)
+def _style_tag() -> str:
+    """Read the stylesheet and wrap it in a <style> tag, once per process"""
+    with open(CSS_PATH, encoding="utf-8") as f:
+        return f"<style>{f.read()}</style>"
 
-    .metric-container {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 1rem;
-        border-radius: 10px;
-        color: white;
-        text-align: center;
-        margin: 0.5rem 0;
-    }
 
-    .code-container {
-        background-color: #1e1e1e;
-        border-radius: 10px;
-        padding: 1rem;
-        margin: 1rem 0;
-    }
-
-    .feature-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        margin: 1rem 0;
-        border-left: 4px solid #2563eb;
-    }
-
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 2px;
-    }
-
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        background-color: #f0f2f6;
-        border-radius: 5px 5px 0 0;
-        color: #262730;
-        font-weight: 500;
-    }
-
-    .stTabs [aria-selected="true"] {
-        background-color: #2563eb;
-        color: white;
-    }
-
-    .analysis-header {
-        background: linear-gradient(90deg, #2563eb, #7c3aed);
-        color: white;
-        padding: 1rem;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-        text-align: center;
-    }
-
-    .sidebar-header {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        padding: 1rem;
-        border-radius: 10px;
-        text-align: center;
-        margin-bottom: 1rem;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Streamlit drops elements a rerun doesn't emit, so the tag is sent every run
+st.markdown(_style_tag(), unsafe_allow_html=True)
 
 # Configuration
-ALLOWED_EXTENSIONS = {'.py', '.js', '.cpp', '.java', '.html', '.css', '.php', }
+ALLOWED_EXTENSIONS = frozenset({'.py', '.js', '.cpp', '.java', '.html', '.css', '.php'})
 MAX_FILE_SIZE = 1024 * 1024  # 1MB
 MAX_CODE_LENGTH = 50000  # 50K characters
+MAX_HISTORY_ITEMS = 50  # Upper bound of the sidebar history size; oldest analyses are dropped beyond it
+MAX_STORED_RESULT_LENGTH = 10000  # 10K characters kept per history entry
+MAX_STORED_SNIPPETS = 32  # Distinct code snippets kept per session
+CODE_STATS_CACHE_SIZE = 128  # Code context stats remembered per session
+
+# On-disk history and code snippets, shared by all sessions of this server
+HISTORY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".devgenie_cache")
+HISTORY_CACHE_SIZE_LIMIT = 2 ** 30  # 1GB; least recently stored entries are evicted beyond this
+# Nothing can reach a session's entries once it ends, so they last about as long
+# as a working session; every write pushes the expiry back
+HISTORY_TTL = 2 * 60 * 60  # 2 hours
+
+# Gemini generation settings: (max_output_tokens, temperature, top_p, top_k)
+GENERATION_SETTINGS = (8192, 0.7, 0.95, 40)
+RESPONSE_CACHE_TTL = 24 * 60 * 60  # 24 hours
+STREAM_RENDER_INTERVAL = 0.05  # Seconds between markdown redraws while streaming
+MAX_CONCURRENT_REQUESTS = 5  # Parallel Gemini calls for "Analyze All Files"
+MAX_REQUESTS_PER_SECOND = 10
+
+# Language for each known file extension (covers every uploadable one), so
+# files with a name never need content sniffing
+_EXT_TO_LANG = MappingProxyType({
+    '.py': 'python',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.ts': 'javascript',
+    '.tsx': 'javascript',
+    '.cpp': 'cpp',
+    '.cxx': 'cpp',
+    '.cc': 'cpp',
+    '.c': 'cpp',
+    '.h': 'cpp',
+    '.hpp': 'cpp',
+    '.java': 'java',
+    '.html': 'html',
+    '.htm': 'html',
+    '.css': 'css',
+    '.scss': 'css',
+    '.sass': 'css',
+    '.less': 'css',
+    '.php': 'php',
+    '.php3': 'php',
+    '.php4': 'php',
+    '.php5': 'php'
+})
+
+# Extensions in the form st.file_uploader expects, built once at import
+_UPLOAD_TYPES = [ext.lstrip('.') for ext in ALLOWED_EXTENSIONS]
+_ALLOWED_EXTS_DISPLAY = ", ".join(ALLOWED_EXTENSIONS)
+
+# Code patterns that trigger a security warning, matched against lowercased code
+_SUSPICIOUS_PATTERNS = ('eval(', 'exec(', '__import__', 'subprocess', 'os.system')
+
+# Language signatures for content-based detection, matched against lowercased code
+_LANGUAGE_SIGNATURES = MappingProxyType({
+    'javascript': (
+        'function(', 'const ', 'let ', 'var ', '=>', 'console.log',
+        'document.', 'window.', '$(', 'jquery', 'react', 'angular',
+        'npm', 'node', 'express', 'async/await', '.then(', '.catch(',
+        'export ', 'import ', 'require('
+    ),
+    'python': (
+        'def ', 'import ', 'from ', 'print(', 'if __name__',
+        'class ', 'self.', 'elif ', '__init__', 'lambda ',
+        'range(', 'len(', 'str(', 'int(', 'float(', 'list(',
+        'dict(', 'tuple(', 'set('
+    ),
+    'java': (
+        'public class', 'private ', 'public ', 'static void main',
+        'system.out.println', 'string[]', 'arraylist', 'hashmap',
+        'public static', 'extends ', 'implements ', 'interface '
+    ),
+    'cpp': (
+        '#include', 'std::', 'cout', 'cin', 'namespace ',
+        'using namespace', 'int main()', 'class ', 'template<',
+        '#define', '#ifndef', '#ifdef', 'vector<', 'string '
+    ),
+    'html': (
+        '<!doctype', '<html', '<head>', '<body>', '<div', '<span',
+        '<p>', '<a href', '<img', '<script', '<style', '<link'
+    ),
+    'css': (
+        '{', '}', 'color:', 'background:', 'font-', 'margin:',
+        'padding:', 'border:', 'width:', 'height:', '@media',
+        'display:', 'position:', 'flex', 'grid'
+    ),
+    'php': (
+        '<?php', '$_', 'echo ', 'function ', 'class ', 'public function',
+        'private function', 'protected function', '$this->', 'array(',
+        'mysqli', 'pdo', 'include ', 'require '
+    )
+})
+
+# System prompts per analysis mode, formatted with the target language
+_BASE_PROMPT_TEMPLATES = MappingProxyType({
+    'explain': "You are an expert {lang} programmer and teacher. Explain code clearly and comprehensively, breaking down complex concepts into understandable parts. Focus on what the code does, how it works, and why it's structured that way. Use markdown formatting for better readability.",
+    'refactor': "You are a senior {lang} developer specializing in code optimization and best practices. Refactor the provided code to improve readability, performance, and maintainability while preserving functionality. Explain your changes using markdown formatting.",
+    'debug': "You are an expert {lang} debugger. Analyze the code for potential bugs, errors, or issues. Provide specific suggestions for fixes and improvements. Use markdown formatting.",
+    'optimize': "You are a {lang} performance optimization expert. Analyze the code for performance improvements, memory usage optimization, and efficiency gains. Provide optimized code with explanations.",
+    'security': "You are a {lang} security expert. Analyze the code for security vulnerabilities, potential exploits, and security best practices. Provide secure alternatives where needed.",
+    'followup': "You are a knowledgeable {lang} programming expert. Answer the specific question about the provided code with accuracy and clarity using markdown formatting."
+})
+
+# User prompts per analysis mode, formatted with the language and code
+_USER_PROMPT_TEMPLATES = MappingProxyType({
+    'explain': "Explain this {lang} code step by step, including what it does, how it works, and any important concepts:\n\n```{lang}\n{code}\n```",
+    'refactor': "Refactor this {lang} code for better readability, performance, and best practices:\n\n```{lang}\n{code}\n```",
+    'debug': "Debug this {lang} code and identify potential issues:\n\n```{lang}\n{code}\n```",
+    'optimize': "Optimize this {lang} code for better performance:\n\n```{lang}\n{code}\n```",
+    'security': "Analyze this {lang} code for security vulnerabilities:\n\n```{lang}\n{code}\n```"
+})
+_FOLLOWUP_PROMPT_TEMPLATE = "Here's the {lang} code:\n\n```{lang}\n{code}\n```\n\nQuestion: {question}"
+
+# Multi-file prompts: one request covers several same-language files, and the
+# response is split back into per-file sections on the "## <filename>" headings
+_BATCH_TASKS = MappingProxyType({
+    'explain': "Explain each file step by step, including what it does, how it works, and any important concepts.",
+    'refactor': "Refactor each file for better readability, performance, and best practices.",
+    'debug': "Debug each file and identify potential issues.",
+    'optimize': "Optimize each file for better performance.",
+    'security': "Analyze each file for security vulnerabilities."
+})
+_BATCH_PROMPT_TEMPLATE = (
+    "Analyze the following {lang} files. {task}\n\n"
+    "For each file, produce a section headed by its filename as a level-2 heading "
+    "(for example `## app.py`), and use no other level-2 headings.\n\n{files}"
+)
+_BATCH_FILE_TEMPLATE = "## {name}\n```{lang}\n{code}\n```"
+
+# Output languages offered for translated responses
+_LANG_NAMES = MappingProxyType({
+    'en': 'English',
+    'es': 'Spanish',
+    'hi': 'Hindi',
+    'fr': 'French',
+    'de': 'German',
+    'zh': 'Chinese',
+    'ja': 'Japanese'
+})
+
+# Sidebar selectbox labels
+_MODE_LABELS = MappingProxyType({
+    "explain": "📚 Explain Code",
+    "refactor": "🔧 Refactor Code",
+    "debug": "🐛 Debug Code",
+    "optimize": "⚡ Optimize Performance",
+    "security": "🔒 Security Analysis"
+})
+_LANGUAGE_LABELS = MappingProxyType({
+    "auto": "🤖 Auto-Detect",
+    "python": "🐍 Python",
+    "javascript": "⚡ JavaScript",
+    "cpp": "⚙️ C++",
+    "java": "☕ Java",
+    "html": "🌐 HTML",
+    "css": "🎨 CSS",
+    "php": "🔷 PHP"
+})
+_TRANSLATION_LABELS = MappingProxyType({
+    "none": "🌍 Original",
+    "en": "🇺🇸 English",
+    "es": "🇪🇸 Spanish",
+    "hi": "🇮🇳 Hindi",
+    "fr": "🇫🇷 French",
+    "de": "🇩🇪 German",
+    "zh": "🇨🇳 Chinese",
+    "ja": "🇯🇵 Japanese"
+})
+
+# Gemini model used for every analysis
+GEMINI_MODEL = 'gemini-2.0-flash-exp'
+
+# Connection pool limits for every client talking to the Gemini API
+HTTP_MAX_CONNECTIONS = 50
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+
+
+def _new_client(asynchronous: bool = False) -> "genai.Client":
+    """Create a Gemini client whose sync, or async, HTTP transport uses the shared pool limits.
+
+    The SDK always builds both transports; an async client closes its sync one
+    straight away, and the caller closes the async one with client.aio.aclose().
+    """
+    # The SDK is heavy to import, so it loads on the first analysis rather than at startup
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                          max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS)
+    transport_args = 'async_client_args' if asynchronous else 'client_args'
+    client = genai.Client(
+        api_key=GEMINI_API_KEY,
+        http_options=types.HttpOptions(**{transport_args: {'limits': limits}})
+    )
+    if asynchronous:
+        client.close()
+    return client
+
+
+@st.cache_resource
+def _get_client() -> "genai.Client":
+    """Gemini client shared across sessions, reusing one pooled HTTP connection set"""
+    return _new_client()
+
+
+@dataclass
+class AnalyzerResult:
+    """Outcome of an analysis: the response text, or the error message when not ok,
+    plus any suspicious patterns found in the analyzed code"""
+    __slots__ = ('ok', 'text', 'suspicious')
+    ok: bool
+    text: str
+    suspicious: Tuple[str, ...]
+
+
+class AnalysisError(Exception):
+    """An analysis request that couldn't be sent; the message is ready to show"""
 
 
 class CodeAnalyzer:
     def __init__(self):
-        self.model = None
-        self.initialize_gemini()
+        self._client = None
+
+    @property
+    def client(self) -> Optional["genai.Client"]:
+        """Gemini client, created on first use so page loads don't import the SDK"""
+        if self._client is None:
+            self.initialize_gemini()
+        return self._client
 
     def initialize_gemini(self):
         """Initialize Gemini client"""
         try:
-            # Configure Gemini with the hardcoded API key
-            genai.configure(api_key=GEMINI_API_KEY)
-
-            # Initialize the model (using Gemini Flash 2.5)
-            self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+            self._client = _get_client()
 
             logger.info("Gemini Flash 2.5 client initialized successfully")
             return True
@@ -157,215 +304,33 @@ class CodeAnalyzer:
             st.error(f"Gemini initialization failed: {e}")
             return False
 
-    def detect_language(self, code: str, filename: str = None) -> str:
+    @staticmethod
+    def detect_language(code: str, filename: Optional[str] = None) -> str:
         """Detect programming language from code with improved mapping"""
 
         # First, try filename-based detection if available
         if filename:
-            file_ext = filename.lower().split('.')[-1] if '.' in filename else ''
-            ext_map = {
-                'py': 'python',
-                'js': 'javascript',
-                'jsx': 'javascript',
-                'ts': 'javascript',
-                'tsx': 'javascript',
-                'cpp': 'cpp',
-                'cxx': 'cpp',
-                'cc': 'cpp',
-                'c': 'cpp',
-                'h': 'cpp',
-                'hpp': 'cpp',
-                'java': 'java',
-                'html': 'html',
-                'htm': 'html',
-                'css': 'css',
-                'scss': 'css',
-                'sass': 'css',
-                'less': 'css',
-                'php': 'php',
-                'php3': 'php',
-                'php4': 'php',
-                'php5': 'php'
-            }
-            if file_ext in ext_map:
-                logger.info(f"Language detected: {ext_map[file_ext]} (from filename: {filename})")
-                return ext_map[file_ext]
+            lang = _EXT_TO_LANG.get(os.path.splitext(filename)[1].lower())
+            if lang:
+                logger.info(f"Language detected: {lang} (from filename: {filename})")
+                return lang
 
-        try:
-            lexer = guess_lexer(code)
-
-            # More comprehensive language mapping based on lexer names and aliases
-            # This handles the complex lexer names that Pygments returns
-            language_map = {
-                # Python variations
-                'python': 'python',
-                'python3': 'python',
-                'py': 'python',
-                'py3': 'python',
-                'sage': 'python',
-                'python3traceback': 'python',
-                'pytb': 'python',
-                'py3tb': 'python',
-
-                # JavaScript variations
-                'javascript': 'javascript',
-                'js': 'javascript',
-                'jsx': 'javascript',
-                'node': 'javascript',
-                'javascript+genshi': 'javascript',
-                'js+genshi': 'javascript',
-                'genshi': 'javascript',  # Common misidentification
-
-                # C++ variations
-                'c++': 'cpp',
-                'cpp': 'cpp',
-                'cxx': 'cpp',
-                'cc': 'cpp',
-                'c': 'cpp',
-                'arduino': 'cpp',
-                'cuda': 'cpp',
-
-                # Java variations
-                'java': 'java',
-
-                # HTML variations
-                'html': 'html',
-                'htm': 'html',
-                'html+genshi': 'html',
-                'html+kid': 'html',
-                'html+smarty': 'html',
-                'html+velocity': 'html',
-                'rhtml': 'html',
-                'html+django': 'html',
-                'html+jinja': 'html',
-                'htmldjango': 'html',
-
-                # CSS variations
-                'css': 'css',
-                'scss': 'css',
-                'sass': 'css',
-                'less': 'css',
-                'stylus': 'css',
-                'css+genshi': 'css',
-                'css+django': 'css',
-                'css+jinja': 'css',
-
-                # PHP variations
-                'php': 'php',
-                'php3': 'php',
-                'php4': 'php',
-                'php5': 'php',
-                'html+php': 'php',
-
-                # SQL variations (commonly misidentified)
-                'sql': 'python',  # Often SQL gets confused with Python
-                'mysql': 'python',
-                'postgresql': 'python',
-                'sqlite3': 'python',
-                'plpgsql': 'python',
-                'tsql': 'python',
-            }
+        return _detect_language_cached(code)
 
-            # First, try to get the language from lexer name (lowercase)
-            lexer_name = lexer.name.lower()
-
-            # Check direct matches first
-            for key, value in language_map.items():
-                if key in lexer_name:
-                    logger.info(f"Language detected: {value} (from lexer name: {lexer.name})")
-                    return value
-
-            # If no direct match, try lexer aliases
-            if hasattr(lexer, 'aliases') and lexer.aliases:
-                for alias in lexer.aliases:
-                    alias_lower = alias.lower()
-                    if alias_lower in language_map:
-                        logger.info(f"Language detected: {language_map[alias_lower]} (from lexer alias: {alias})")
-                        return language_map[alias_lower]
-
-            # Fallback: analyze code content for better detection
-            detected_lang = self.analyze_code_content(code)
-            if detected_lang:
-                logger.info(f"Language detected: {detected_lang} (from content analysis)")
-                return detected_lang
-
-            # If still no match, return the original lexer name or default
-            logger.warning(f"Unknown lexer detected: {lexer.name}, defaulting to python")
-            return "python"
-
-        except ClassNotFound:
-            # If pygments fails, try content-based detection
-            detected_lang = self.analyze_code_content(code)
-            if detected_lang:
-                logger.info(f"Language detected: {detected_lang} (fallback content analysis)")
-                return detected_lang
-
-            logger.warning("Could not detect language, defaulting to python")
-            return "python"
-
-    def analyze_code_content(self, code: str) -> str:
+    @staticmethod
+    def analyze_code_content(code: str) -> str:
         """Analyze code content for language detection patterns"""
-        code_lower = code.lower().strip()
-
-        # JavaScript patterns
-        js_patterns = [
-            'function(', 'const ', 'let ', 'var ', '=>', 'console.log',
-            'document.', 'window.', '$(', 'jquery', 'react', 'angular',
-            'npm', 'node', 'express', 'async/await', '.then(', '.catch(',
-            'export ', 'import ', 'require('
-        ]
-
-        # Python patterns
-        python_patterns = [
-            'def ', 'import ', 'from ', 'print(', 'if __name__',
-            'class ', 'self.', 'elif ', '__init__', 'lambda ',
-            'range(', 'len(', 'str(', 'int(', 'float(', 'list(',
-            'dict(', 'tuple(', 'set('
-        ]
-
-        # Java patterns
-        java_patterns = [
-            'public class', 'private ', 'public ', 'static void main',
-            'system.out.println', 'string[]', 'arraylist', 'hashmap',
-            'public static', 'extends ', 'implements ', 'interface '
-        ]
-
-        # C++ patterns
-        cpp_patterns = [
-            '#include', 'std::', 'cout', 'cin', 'namespace ',
-            'using namespace', 'int main()', 'class ', 'template<',
-            '#define', '#ifndef', '#ifdef', 'vector<', 'string '
-        ]
-
-        # HTML patterns
-        html_patterns = [
-            '<!doctype', '<html', '<head>', '<body>', '<div', '<span',
-            '<p>', '<a href', '<img', '<script', '<style', '<link'
-        ]
-
-        # CSS patterns
-        css_patterns = [
-            '{', '}', 'color:', 'background:', 'font-', 'margin:',
-            'padding:', 'border:', 'width:', 'height:', '@media',
-            'display:', 'position:', 'flex', 'grid'
-        ]
-
-        # PHP patterns
-        php_patterns = [
-            '<?php', '$_', 'echo ', 'function ', 'class ', 'public function',
-            'private function', 'protected function', '$this->', 'array(',
-            'mysqli', 'pdo', 'include ', 'require '
-        ]
+        # Unambiguous opening tokens settle it without lowercasing the whole file
+        lang = _head_signature(code)
+        if lang:
+            return lang
+
+        code_lower = code.lower()
 
         # Count pattern matches
         pattern_counts = {
-            'javascript': sum(1 for pattern in js_patterns if pattern in code_lower),
-            'python': sum(1 for pattern in python_patterns if pattern in code_lower),
-            'java': sum(1 for pattern in java_patterns if pattern in code_lower),
-            'cpp': sum(1 for pattern in cpp_patterns if pattern in code_lower),
-            'html': sum(1 for pattern in html_patterns if pattern in code_lower),
-            'css': sum(1 for pattern in css_patterns if pattern in code_lower),
-            'php': sum(1 for pattern in php_patterns if pattern in code_lower)
+            lang: sum(1 for pattern in patterns if pattern in code_lower)
+            for lang, patterns in _LANGUAGE_SIGNATURES.items()
         }
 
         # Return language with highest match count (minimum 2 matches required)
@@ -377,120 +342,961 @@ class CodeAnalyzer:
 
         return None
 
-    def validate_code_input(self, code: str) -> Tuple[bool, str]:
-        """Validate code input"""
-        if not code or not code.strip():
-            return False, "Code cannot be empty"
+    def validate_code_input(self, code: str) -> Tuple[bool, str, Tuple[str, ...]]:
+        """Validate code input, also returning the suspicious patterns it contains.
+
+        The patterns are returned rather than shown, so callers can keep them
+        with the result and warn next to it on later reruns.
+        """
+        if not code or code.isspace():
+            return False, "Code cannot be empty", ()
 
         if len(code) > MAX_CODE_LENGTH:
-            return False, f"Code is too long. Maximum {MAX_CODE_LENGTH:,} characters allowed."
+            return False, f"Code is too long. Maximum {MAX_CODE_LENGTH:,} characters allowed.", ()
 
         # Basic security check
-        suspicious_patterns = ['eval(', 'exec(', '__import__', 'subprocess', 'os.system']
-        if any(pattern in code.lower() for pattern in suspicious_patterns):
-            logger.warning(f"Suspicious code pattern detected")
-            st.warning("⚠️ Potentially suspicious code patterns detected. Proceed with caution.")
+        found = self.suspicious_patterns(code)
+        if found:
+            logger.warning(f"Suspicious code pattern detected: {', '.join(found)}")
+
+        return True, "Valid", found
 
-        return True, "Valid"
+    @staticmethod
+    def suspicious_patterns(code: str) -> Tuple[str, ...]:
+        """Suspicious patterns present in the code"""
+        # Lowercase once, then use C-level substring scans
+        code_lower = code.lower()
+        return tuple(pattern for pattern in _SUSPICIOUS_PATTERNS if pattern in code_lower)
 
     def get_system_prompt(self, lang: str, mode: str) -> str:
         """Generate system prompt based on language and mode"""
-        base_prompts = {
-            'explain': f"You are an expert {lang} programmer and teacher. Explain code clearly and comprehensively, breaking down complex concepts into understandable parts. Focus on what the code does, how it works, and why it's structured that way. Use markdown formatting for better readability.",
-            'refactor': f"You are a senior {lang} developer specializing in code optimization and best practices. Refactor the provided code to improve readability, performance, and maintainability while preserving functionality. Explain your changes using markdown formatting.",
-            'debug': f"You are an expert {lang} debugger. Analyze the code for potential bugs, errors, or issues. Provide specific suggestions for fixes and improvements. Use markdown formatting.",
-            'optimize': f"You are a {lang} performance optimization expert. Analyze the code for performance improvements, memory usage optimization, and efficiency gains. Provide optimized code with explanations.",
-            'security': f"You are a {lang} security expert. Analyze the code for security vulnerabilities, potential exploits, and security best practices. Provide secure alternatives where needed.",
-            'followup': f"You are a knowledgeable {lang} programming expert. Answer the specific question about the provided code with accuracy and clarity using markdown formatting."
-        }
-        return base_prompts.get(mode, base_prompts['explain'])
+        return _BASE_PROMPT_TEMPLATES.get(mode, _BASE_PROMPT_TEMPLATES['explain']).format(lang=lang)
 
     def process_code(self, code: str, mode: str, lang: str, translate_to: Optional[str] = None,
-                     followup_question: Optional[str] = None) -> str:
+                     followup_question: Optional[str] = None) -> "AnalyzerResult":
         """Process code with Gemini API"""
+        suspicious = ()
         try:
-            if not self.model:
-                return "❌ Error: Gemini client not initialized. Please check your API key."
+            if not self.client:
+                return AnalyzerResult(False, "❌ Error: Gemini client not initialized. Please check your API key.",
+                                      suspicious)
 
             # Validate input
-            is_valid, error_msg = self.validate_code_input(code)
+            is_valid, error_msg, suspicious = self.validate_code_input(code)
             if not is_valid:
-                return f"❌ Error: {error_msg}"
-
-            # Prepare prompt based on mode
-            system_prompt = self.get_system_prompt(lang, mode)
-
-            if mode == "refactor":
-                user_prompt = f"Refactor this {lang} code for better readability, performance, and best practices:\n\n```{lang}\n{code}\n```"
-            elif mode == "debug":
-                user_prompt = f"Debug this {lang} code and identify potential issues:\n\n```{lang}\n{code}\n```"
-            elif mode == "optimize":
-                user_prompt = f"Optimize this {lang} code for better performance:\n\n```{lang}\n{code}\n```"
-            elif mode == "security":
-                user_prompt = f"Analyze this {lang} code for security vulnerabilities:\n\n```{lang}\n{code}\n```"
-            elif mode == "followup" and followup_question:
-                user_prompt = f"Here's the {lang} code:\n\n```{lang}\n{code}\n```\n\nQuestion: {followup_question}"
-            else:
-                user_prompt = f"Explain this {lang} code step by step, including what it does, how it works, and any important concepts:\n\n```{lang}\n{code}\n```"
-
-            # Add translation request if specified
-            if translate_to and translate_to != "none":
-                language_names = {
-                    'en': 'English',
-                    'es': 'Spanish',
-                    'hi': 'Hindi',
-                    'fr': 'French',
-                    'de': 'German',
-                    'zh': 'Chinese',
-                    'ja': 'Japanese'
-                }
-                lang_name = language_names.get(translate_to, translate_to)
-                user_prompt += f"\n\nPlease provide your response in {lang_name}."
-
-            # Combine system and user prompts for Gemini
-            full_prompt = f"{system_prompt}\n\n{user_prompt}"
-
-            # Make API call with updated configuration for Flash 2.5
-            with st.spinner("🔄 Analyzing code"):
-                response = self.model.generate_content(
-                    full_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        max_output_tokens=8192,  # Increased for Flash 2.5
-                        temperature=0.7,
-                        top_p=0.95,
-                        top_k=40
-                    )
-                )
+                return AnalyzerResult(False, f"❌ Error: {error_msg}", suspicious)
+
+            prompt = self.build_prompt(code, mode, lang, translate_to, followup_question)
 
-            result = response.text.strip()
+            # Identical prompts reuse the cached response instead of re-hitting the API
+            result = _run_gemini(self.client, _prompt_hash(prompt), prompt, GENERATION_SETTINGS)
             logger.info(f"API call successful - Mode: {mode}, Language: {lang}, Model: Flash 2.5")
-            return result
+            return AnalyzerResult(True, result, suspicious)
 
         except Exception as e:
             logger.error(f"Error in process_code: {str(e)}")
-            if "quota" in str(e).lower() or "rate limit" in str(e).lower():
-                return "❌ Error: API rate limit exceeded. Please try again later."
-            elif "api key" in str(e).lower() or "authentication" in str(e).lower():
-                return "❌ Error: API authentication failed. Please check your API key."
-            elif "safety" in str(e).lower():
-                return "❌ Error: Content was blocked by safety filters. Please try with different code."
+            return AnalyzerResult(False, _format_api_error(e), suspicious)
+
+    def process_code_stream(self, code: str, mode: str, lang: str, translate_to: Optional[str] = None,
+                            followup_question: Optional[str] = None
+                            ) -> Tuple[Tuple[str, ...], Iterator[str]]:
+        """Validate the code and return its suspicious patterns, plus a generator
+        yielding the Gemini response in chunks as it streams in.
+
+        Raises AnalysisError right away when the request can't be sent; API
+        errors are raised by the generator as the SDK reports them.
+        """
+        if not self.client:
+            raise AnalysisError("❌ Error: Gemini client not initialized. Please check your API key.")
+
+        is_valid, error_msg, suspicious = self.validate_code_input(code)
+        if not is_valid:
+            raise AnalysisError(f"❌ Error: {error_msg}")
+
+        prompt = self.build_prompt(code, mode, lang, translate_to, followup_question)
+        return suspicious, self._stream_prompt(prompt, mode, lang)
+
+    def _stream_prompt(self, prompt: Tuple[str, str], mode: str, lang: str) -> Iterator[str]:
+        """Yield a built prompt's response in chunks as it streams in"""
+        yield from _stream_gemini(self.client, _prompt_hash(prompt), prompt, GENERATION_SETTINGS)
+        logger.info(f"API call successful - Mode: {mode}, Language: {lang}, Model: Flash 2.5")
+
+    def process_many(self, files: List[Tuple[str, str, str]], mode: str,
+                     translate_to: Optional[str] = None) -> List["AnalyzerResult"]:
+        """Process several (name, code, lang) files, returning one result per file in order.
+
+        Same-language files are packed into shared requests of up to
+        MAX_CODE_LENGTH characters, and the requests are sent concurrently.
+        """
+        if not self.client:
+            error = AnalyzerResult(False, "❌ Error: Gemini client not initialized. Please check your API key.", ())
+            return [error] * len(files)
+
+        results = [None] * len(files)
+        suspicious = [()] * len(files)
+
+        # Group file indices by language, starting a new group when one would overflow
+        groups = []
+        open_groups = {}
+        for i, (name, code, lang) in enumerate(files):
+            is_valid, error_msg, suspicious[i] = self.validate_code_input(code)
+            if not is_valid:
+                results[i] = AnalyzerResult(False, f"❌ Error: {error_msg}", suspicious[i])
+                continue
+
+            group = open_groups.get(lang)
+            if group is None or group["size"] + len(code) > MAX_CODE_LENGTH:
+                group = {"lang": lang, "indices": [], "size": 0}
+                open_groups[lang] = group
+                groups.append(group)
+            group["indices"].append(i)
+            group["size"] += len(code)
+
+        pending = []
+        for group in groups:
+            indices = group["indices"]
+            if len(indices) == 1:
+                name, code, lang = files[indices[0]]
+                group["prompt"] = self.build_prompt(code, mode, lang, translate_to)
             else:
-                return f"❌ Error: {str(e)}"
+                group["prompt"] = self.build_batch_prompt(
+                    [(files[i][0], files[i][1]) for i in indices], mode, group["lang"], translate_to
+                )
+            group["hash"] = _prompt_hash(group["prompt"])
+            try:
+                group["response"] = (True, _cached_response(group["hash"], GENERATION_SETTINGS))
+            except KeyError:
+                pending.append(group)
+
+        if pending:
+            with st.spinner(f"🔄 Analyzing {len(files)} files"):
+                responses = asyncio.run(_process_many([group["prompt"] for group in pending], GENERATION_SETTINGS))
+
+            for group, response in zip(pending, responses):
+                if isinstance(response, Exception):
+                    logger.error(f"Error in process_many: {str(response)}")
+                    group["response"] = (False, _format_api_error(response))
+                else:
+                    group["response"] = (True, _cached_response(group["hash"], GENERATION_SETTINGS, _text=response))
+
+        # Each file gets its own result, carrying its own suspicious patterns
+        for group in groups:
+            ok, text = group["response"]
+            if len(group["indices"]) == 1 or not ok:
+                for i in group["indices"]:
+                    results[i] = AnalyzerResult(ok, text, suspicious[i])
+                continue
+
+            # Fall back to the whole response for any file the model didn't head
+            sections = _split_file_sections(text, [files[i][0] for i in group["indices"]])
+            for i in group["indices"]:
+                results[i] = AnalyzerResult(True, sections.get(files[i][0], text), suspicious[i])
+
+        logger.info(f"Batch processed - Mode: {mode}, Files: {len(files)}, Requests: {len(groups)}, "
+                    f"API calls: {len(pending)}")
+        return results
+
+    def build_prompt(self, code: str, mode: str, lang: str, translate_to: Optional[str] = None,
+                     followup_question: Optional[str] = None) -> Tuple[str, str]:
+        """Build the (system instruction, user prompt) pair for the given mode"""
+        # Trailing whitespace doesn't change the analysis; dropping it lets
+        # otherwise identical submissions share a cached response
+        code = code.rstrip()
+
+        # Prepare prompt based on mode
+        system_prompt = self.get_system_prompt(lang, mode)
+
+        if mode == "followup" and followup_question:
+            user_prompt = _FOLLOWUP_PROMPT_TEMPLATE.format(lang=lang, code=code, question=followup_question)
+        else:
+            template = _USER_PROMPT_TEMPLATES.get(mode, _USER_PROMPT_TEMPLATES['explain'])
+            user_prompt = template.format(lang=lang, code=code)
+
+        # Add translation request if specified
+        user_prompt += _translation_instruction(translate_to)
+
+        # The system prompt goes out as a system instruction, so every request
+        # for the same (lang, mode) starts with an identical, cacheable prefix
+        return system_prompt, user_prompt
+
+    def build_batch_prompt(self, files: List[Tuple[str, str]], mode: str, lang: str,
+                           translate_to: Optional[str] = None) -> Tuple[str, str]:
+        """Build one (system instruction, user prompt) pair covering several same-language files"""
+        system_prompt = self.get_system_prompt(lang, mode)
+        file_blocks = "\n\n".join(
+            _BATCH_FILE_TEMPLATE.format(name=name, lang=lang, code=code.rstrip()) for name, code in files
+        )
+        user_prompt = _BATCH_PROMPT_TEMPLATE.format(
+            lang=lang,
+            task=_BATCH_TASKS.get(mode, _BATCH_TASKS['explain']),
+            files=file_blocks
+        )
+        user_prompt += _translation_instruction(translate_to)
+        return system_prompt, user_prompt
+
+
+def _head_signature(code: str) -> Optional[str]:
+    """Language named by an unambiguous token at the start of the code, if any"""
+    head = code[:256].lstrip().lower()
+    if '<?php' in head:
+        return 'php'
+    # PHP templates often open with HTML, so only call it HTML when no PHP tag, in
+    # any case, follows; the whole code is lowercased only on this path
+    if (head.startswith('<!doctype') or head.startswith('<html')) and '<?php' not in code.lower():
+        return 'html'
+    if head.startswith('#include'):
+        return 'cpp'
+    if head.startswith('#!') and 'python' in head.partition('\n')[0]:
+        return 'python'
+    return None
+
+
+def _translation_instruction(translate_to: Optional[str]) -> str:
+    """Prompt suffix asking for the response in the selected output language"""
+    if translate_to and translate_to != "none":
+        lang_name = _LANG_NAMES.get(translate_to, translate_to)
+        return f"\n\nPlease provide your response in {lang_name}."
+    return ""
+
+
+def _split_file_sections(response: str, names: List[str]) -> dict:
+    """Split a multi-file response into {filename: section} on its "## <filename>" headings"""
+    known = set(names)
+    sections = {}
+    current = None
+    for line in response.splitlines(keepends=True):
+        if line.startswith("## "):
+            heading = line[3:].strip().strip("`*")
+            if heading in known:
+                current = heading
+                sections[current] = []
+                continue
+        if current is not None:
+            sections[current].append(line)
+    return {name: "".join(lines).strip() for name, lines in sections.items()}
+
+
+def _format_api_error(e: Exception) -> str:
+    """Map an API exception to the user-facing error message"""
+    if "quota" in str(e).lower() or "rate limit" in str(e).lower():
+        return "❌ Error: API rate limit exceeded. Please try again later."
+    elif "api key" in str(e).lower() or "authentication" in str(e).lower():
+        return "❌ Error: API authentication failed. Please check your API key."
+    elif "safety" in str(e).lower():
+        return "❌ Error: Content was blocked by safety filters. Please try with different code."
+    else:
+        return f"❌ Error: {str(e)}"
+
+
+def _prompt_hash(prompt: Tuple[str, str]) -> str:
+    """Short, cheap-to-compare cache key for a (system instruction, user prompt) pair"""
+    system_prompt, user_prompt = prompt
+    return hashlib.blake2b(f"{system_prompt}\0{user_prompt}".encode(), digest_size=16).hexdigest()
+
+
+@functools.lru_cache(maxsize=128)
+def _generation_config(gen_config: tuple, system_prompt: str) -> "types.GenerateContentConfig":
+    """SDK config for a (max_output_tokens, temperature, top_p, top_k) tuple and system
+    instruction, built once per combination (one per language and mode in practice)"""
+    from google.genai import types
+
+    max_output_tokens, temperature, top_p, top_k = gen_config
+    return types.GenerateContentConfig(
+        system_instruction=system_prompt,
+        max_output_tokens=max_output_tokens,
+        temperature=temperature,
+        top_p=top_p,
+        top_k=top_k
+    )
+
+
+@st.cache_data(ttl=RESPONSE_CACHE_TTL, max_entries=64, show_spinner=False)
+def _cached_response(prompt_hash: str, gen_config: tuple, _text: Optional[str] = None) -> str:
+    """Memoized Gemini responses keyed by prompt hash and generation settings.
+
+    Called without ``_text`` this is a lookup: a miss raises KeyError, which
+    st.cache_data never memoizes. Called with ``_text`` it stores the response.
+    """
+    if _text is None:
+        raise KeyError(prompt_hash)
+    return _text
+
+
+def _finish_reason(chunk) -> str:
+    """Best-effort reason a streamed response ended, for error messages"""
+    if chunk is None:
+        return "no response"
+    if chunk.candidates:
+        return str(chunk.candidates[0].finish_reason)
+    if chunk.prompt_feedback:
+        return str(chunk.prompt_feedback.block_reason)
+    return "unknown"
+
+
+def _batched_text(response_stream, seen: list):
+    """Yield streamed text in STREAM_RENDER_INTERVAL batches, collecting every chunk into `seen`"""
+    buf = []
+    # The first chunk goes out as soon as it arrives; only later redraws are throttled
+    last_flush = float('-inf')
+    for chunk in response_stream:
+        seen.append(chunk)
+        buf.append(chunk.text or "")
+        # Batch chunks so the markdown block isn't re-rendered per token
+        now = time.monotonic()
+        if now - last_flush > STREAM_RENDER_INTERVAL:
+            yield "".join(buf)
+            buf.clear()
+            last_flush = now
+    if buf:
+        yield "".join(buf)
+
+
+def _stream_gemini(client: "genai.Client", prompt_hash: str, prompt: Tuple[str, str],
+                   gen_config: tuple) -> Iterator[str]:
+    """Yield a prompt's response text as it streams in, serving and filling the response cache"""
+    try:
+        cached = _cached_response(prompt_hash, gen_config)
+    except KeyError:
+        cached = None
+    if cached is not None:
+        yield cached
+        return
+
+    # Make API call with updated configuration for Flash 2.5
+    with st.spinner("🔄 Analyzing code"):
+        system_prompt, user_prompt = prompt
+        response_stream = client.models.generate_content_stream(
+            model=GEMINI_MODEL,
+            contents=user_prompt,
+            config=_generation_config(gen_config, system_prompt)
+        )
+        # The request is only sent on iteration, so wait for the first chunk here
+        first_chunk = next(response_stream, None)
+
+    chunks = []
+    if first_chunk is not None:
+        yield from _batched_text(itertools.chain([first_chunk], response_stream), chunks)
+
+    result = "".join(chunk.text or "" for chunk in chunks).strip()
+    if not result:
+        # Blocked prompts come back empty instead of raising
+        last_chunk = chunks[-1] if chunks else first_chunk
+        raise ValueError(f"Gemini returned no text (finish reason: {_finish_reason(last_chunk)})")
+
+    # Errors raise before this point, so only successful responses are cached
+    _cached_response(prompt_hash, gen_config, _text=result)
+
+
+def _run_gemini(client: "genai.Client", prompt_hash: str, prompt: Tuple[str, str], gen_config: tuple) -> str:
+    """Return the cached response for a prompt, or stream a fresh one from Gemini"""
+    try:
+        return _cached_response(prompt_hash, gen_config)
+    except KeyError:
+        pass
+
+    # Render tokens as they arrive; the caller renders the final result
+    placeholder = st.empty()
+    try:
+        with placeholder:
+            result = st.write_stream(_stream_gemini(client, prompt_hash, prompt, gen_config))
+    finally:
+        placeholder.empty()
+    return result.strip()
+
+
+async def _process_many(prompts: List[Tuple[str, str]], gen_config: tuple) -> list:
+    """Send prompts concurrently, bounded by a semaphore and a request-rate limit.
+
+    Returns one entry per prompt: the response text, or the exception it raised.
+    """
+    # The async transport binds to the event loop asyncio.run creates, so each
+    # batch gets its own client rather than the cached one, closed once it's done
+    client = _new_client(asynchronous=True)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    rate_lock = asyncio.Lock()
+    interval = 1 / MAX_REQUESTS_PER_SECOND
+    next_start = 0.0
+
+    async def run(prompt: Tuple[str, str]) -> str:
+        nonlocal next_start
+        system_prompt, user_prompt = prompt
+        async with semaphore:
+            # Space request starts out to stay under the per-second rate limit
+            async with rate_lock:
+                loop = asyncio.get_running_loop()
+                delay = next_start - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_start = loop.time() + interval
+
+            response = await client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=user_prompt,
+                config=_generation_config(gen_config, system_prompt)
+            )
+            if not response.text:
+                raise ValueError(f"Gemini returned no text (finish reason: {_finish_reason(response)})")
+            return response.text.strip()
+
+    try:
+        return await asyncio.gather(*(run(prompt) for prompt in prompts), return_exceptions=True)
+    finally:
+        await client.aio.aclose()
+
+
+@st.cache_data(max_entries=256, ttl=3600, show_spinner=False)
+def _detect_language_cached(code: str) -> str:
+    """Content-based language detection, memoized across reruns"""
+    detected_lang = CodeAnalyzer.analyze_code_content(code)
+    if detected_lang:
+        logger.info(f"Language detected: {detected_lang} (from content analysis)")
+        return detected_lang
+
+    logger.warning("Could not detect language, defaulting to python")
+    return "python"
+
+
+@st.cache_resource
+def get_analyzer() -> CodeAnalyzer:
+    """Shared analyzer instance, created once per server process.
+
+    Sessions run on separate threads but only read it; the one write, the
+    lazy client assignment, stores the same cached client whichever thread wins.
+    """
+    return CodeAnalyzer()
 
 
 def initialize_session_state():
     """Initialize session state variables"""
-    if "analyzer" not in st.session_state:
-        st.session_state.analyzer = CodeAnalyzer()
-    if "analysis_history" not in st.session_state:
-        st.session_state.analysis_history = []
-    if "code_snippets" not in st.session_state:
-        st.session_state.code_snippets = {}
+    # History and code snippets live on disk under this id. It stays in session
+    # state only: anyone holding the id could read the history, so it never
+    # goes into the URL
+    if "sid" not in st.session_state:
+        st.session_state.sid = uuid.uuid4().hex
+    # Latest results per tab, so fragment reruns can re-render them
+    if "code_result" not in st.session_state:
+        st.session_state.code_result = None
+    if "upload_results" not in st.session_state:
+        st.session_state.upload_results = {}
+    # Decoded uploads keyed by the uploader's file_id
+    if "file_cache" not in st.session_state:
+        st.session_state.file_cache = {}
+    if "followup_answer" not in st.session_state:
+        st.session_state.followup_answer = None
+    # LRU of (characters, lines) by code_id for the follow-up tab's code context
+    if "code_stats_cache" not in st.session_state:
+        st.session_state.code_stats_cache = collections.OrderedDict()
+
+
+def _preview(text: str, n: int = 200) -> str:
+    """Return text cut to n characters, with an ellipsis when truncated"""
+    return text if len(text) <= n else f"{text[:n]}…"
+
+
+@st.cache_resource
+def _history_store() -> diskcache.Cache:
+    """On-disk store shared by all sessions; keys are namespaced by session id.
+
+    The default least-recently-stored policy keeps reads read-only; LRU would
+    turn every history_tail() on every rerun into a write.
+    """
+    return diskcache.Cache(HISTORY_CACHE_DIR, size_limit=HISTORY_CACHE_SIZE_LIMIT)
+
+
+def _history_limit() -> int:
+    """Entries kept in this session's history, as set in the sidebar"""
+    return st.session_state.get("max_history", MAX_HISTORY_ITEMS)
+
+
+def history_append(item: dict):
+    """Append an entry to this session's history, keeping the newest _history_limit()"""
+    store = _history_store()
+    key = f"hist:{st.session_state.sid}"
+    with store.transact():
+        history = store.get(key, [])
+        history.append(item)
+        store.set(key, history[-_history_limit():], expire=HISTORY_TTL)
+
+
+def _trim_history():
+    """Drop entries beyond a newly lowered history limit"""
+    store = _history_store()
+    key = f"hist:{st.session_state.sid}"
+    with store.transact():
+        history = store.get(key)
+        limit = _history_limit()
+        if history and len(history) > limit:
+            store.set(key, history[-limit:], expire=HISTORY_TTL)
+
+
+def history_tail(n: int) -> list:
+    """This session's n newest history entries, newest first"""
+    history = _history_store().get(f"hist:{st.session_state.sid}", [])
+    return history[-n:][::-1]
+
+
+def _snippet_key(code_id: Optional[str]) -> str:
+    """Store key of one of this session's code snippets"""
+    return f"code:{st.session_state.sid}:{code_id}"
+
+
+def store_code_snippet(code: str) -> str:
+    """Store code once per session under a content hash and return its id.
+
+    Only the MAX_STORED_SNIPPETS most recently used snippets are kept;
+    history entries pointing at older ones show the code as unavailable.
+    """
+    encoded = code.encode()
+    code_id = hashlib.blake2b(encoded, digest_size=8).hexdigest()
+    store = _history_store()
+    with store.transact():
+        # add() leaves an already stored snippet alone; level 1 is fast and
+        # still shrinks source code severalfold
+        store.add(_snippet_key(code_id), zlib.compress(encoded, 1), expire=HISTORY_TTL)
+        _mark_snippet_used(store, code_id)
+    return code_id
+
+
+def touch_code_snippet(code_id: Optional[str]):
+    """Count a stored snippet as the most recently stored one again.
+
+    Follow-ups reuse their parent's snippet without storing it, so without
+    this a snippet still being asked about would be the first one evicted.
+    """
+    store = _history_store()
+    with store.transact():
+        if store.touch(_snippet_key(code_id), expire=HISTORY_TTL):
+            _mark_snippet_used(store, code_id)
+
+
+def _mark_snippet_used(store: diskcache.Cache, code_id: str):
+    """Move code_id to the end of the session's snippet index, evicting the oldest beyond the cap"""
+    index_key = f"codes:{st.session_state.sid}"
+    code_ids = store.get(index_key, [])
+    if code_id in code_ids:
+        code_ids.remove(code_id)
+    code_ids.append(code_id)
+    for old_id in code_ids[:-MAX_STORED_SNIPPETS]:
+        store.delete(_snippet_key(old_id))
+    store.set(index_key, code_ids[-MAX_STORED_SNIPPETS:], expire=HISTORY_TTL)
+
+
+def load_code_snippet(code_id: Optional[str], default: str = '') -> str:
+    """Return the code stored under code_id, or default if it isn't stored"""
+    compressed = _history_store().get(_snippet_key(code_id))
+    if compressed is None:
+        return default
+    return zlib.decompress(compressed).decode()
+
+
+def _count_lines(text: str) -> int:
+    """Count lines without splitting; a trailing newline doesn't start a new line"""
+    return text.count('\n') + (0 if text.endswith('\n') else 1)
+
+
+def _code_stats(text: str) -> Tuple[int, int]:
+    """(characters, lines) of a code snippet"""
+    return len(text), _count_lines(text)
+
+
+def _cached_code_stats(code_id: str, code: str) -> Tuple[int, int]:
+    """(characters, lines) for a stored snippet, memoized per session"""
+    stats_cache = st.session_state.code_stats_cache
+    # code_id is a content hash, so the stats for it never change
+    stats = stats_cache.get(code_id)
+    if stats is None:
+        stats = _code_stats(code)
+        stats_cache[code_id] = stats
+        if len(stats_cache) > CODE_STATS_CACHE_SIZE:
+            stats_cache.popitem(last=False)
+    else:
+        stats_cache.move_to_end(code_id)
+    return stats
 
 
 def is_allowed_file(filename: str) -> bool:
     """Check if file extension is allowed"""
-    return any(filename.lower().endswith(ext) for ext in ALLOWED_EXTENSIONS)
+    return os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def _analyze_upload(file_bytes: bytes, name: str) -> dict:
+    """Decode an uploaded file and derive its display info"""
+    content = file_bytes.decode('utf-8')
+    return {
+        "content": content,
+        "lines": _count_lines(content),
+        "language": _EXT_TO_LANG.get(os.path.splitext(name)[1].lower(), 'text'),
+        "preview": _preview(content, 1000),
+        "history_preview": _preview(content),
+    }
+
+
+@st.fragment
+def _tab_code_analysis(analysis_mode: str, language: str, translation: str):
+    """Code Analysis tab; its widgets rerun only this fragment"""
+    st.markdown("### Code Input")
+
+    # Code input area
+    code_input = st.text_area(
+        "Paste your code here:",
+        height=300,
+        placeholder="# Enter your code here...\nprint('Hello, World!')",
+        help="Paste or type your code for analysis"
+    )
+
+    # Analysis button (removed example button and column layout)
+    analyze_btn = st.button("🚀 Analyze Code", type="primary", use_container_width=True)
+
+    # Perform analysis
+    if analyze_btn and code_input.strip():
+        st.session_state.code_result = None
+
+        # Detect language if auto-detect is selected
+        detected_lang = language
+        if language == "auto":
+            detected_lang = CodeAnalyzer.detect_language(code_input)
+
+        # Perform analysis
+        result = get_analyzer().process_code(
+            code_input, analysis_mode, detected_lang, translation
+        )
+
+        if result.ok:
+            # One clock read for both the history timestamp and the report filename
+            now = time.time()
+            code_id = store_code_snippet(code_input)
+
+            # Save to history; the complete code is stored under code_id
+            history_append({
+                "timestamp": now,
+                "mode": analysis_mode,
+                "language": detected_lang,
+                "language_display": detected_lang.upper(),
+                "code_id": code_id,
+                "code_preview": _preview(code_input),
+                # Store preview for display
+                "result": result.text[:MAX_STORED_RESULT_LENGTH]
+            })
+
+            # Keep the result for later reruns, then rerun the whole app so the
+            # Follow-up tab picks up the new history entry
+            st.session_state.code_result = {
+                "language": detected_lang,
+                "code_id": code_id,
+                "result": result.text,
+                "suspicious": result.suspicious,
+                "file_name": f"analysis_{datetime.fromtimestamp(now).strftime('%Y%m%d_%H%M%S')}.md"
+            }
+            st.rerun()
+        else:
+            _show_suspicious(result.suspicious)
+            st.error(result.text)
+
+    elif analyze_btn:
+        st.warning("⚠️ Please enter some code to analyze.")
+
+    # Display results
+    code_result = st.session_state.code_result
+    if code_result:
+        _show_suspicious(code_result["suspicious"])
+        st.markdown("""
+        <div class="analysis-header">
+            <h3>💡 Analysis Result</h3>
+            <p>AI-powered code analysis complete</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown(code_result["result"])
+
+        # Download option
+        analyzed_code = load_code_snippet(code_result["code_id"])
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "📥 Download Analysis",
+                data=f"# Code Analysis Report\n\n## Code:\n```{code_result['language']}\n{analyzed_code}\n```\n\n## Analysis:\n{code_result['result']}",
+                file_name=code_result["file_name"],
+                mime="text/markdown"
+            )
+        with col2:
+            # The callback clears the result before the rerun the click triggers,
+            # so the result is gone without a second rerun
+            st.button("🔄 Analyze Again", on_click=_clear_code_result)
+
+
+def _clear_code_result():
+    """Forget the Code Analysis tab's result"""
+    st.session_state.code_result = None
+
+
+@st.fragment
+def _tab_file_upload(analysis_mode: str, language: str, translation: str):
+    """File Upload tab; its widgets rerun only this fragment"""
+    st.markdown("### File Upload")
+    st.info("📁 Upload code files for analysis. Supported formats: " + _ALLOWED_EXTS_DISPLAY)
+
+    uploaded_files = st.file_uploader(
+        "Choose code files",
+        accept_multiple_files=True,
+        type=_UPLOAD_TYPES
+    )
+
+    # Forget results and decoded content for files that are no longer uploaded
+    upload_results = st.session_state.upload_results
+    current_names = {uploaded_file.name for uploaded_file in uploaded_files or []}
+    for name in [name for name in upload_results if name not in current_names]:
+        del upload_results[name]
+    file_cache = st.session_state.file_cache
+    current_ids = {uploaded_file.file_id for uploaded_file in uploaded_files or []}
+    for file_id in [file_id for file_id in file_cache if file_id not in current_ids]:
+        del file_cache[file_id]
+
+    if uploaded_files:
+        # (name, content, language) of every file that decoded cleanly
+        readable_files = []
+
+        for uploaded_file in uploaded_files:
+            if uploaded_file.size > MAX_FILE_SIZE:
+                st.error(f"❌ File '{uploaded_file.name}' is too large (max {MAX_FILE_SIZE // 1024 // 1024}MB)")
+                continue
+
+            try:
+                # Decode and inspect each upload once; file_id changes whenever the file does
+                upload = file_cache.get(uploaded_file.file_id)
+                if upload is None:
+                    upload = _analyze_upload(uploaded_file.getvalue(), uploaded_file.name)
+                    file_cache[uploaded_file.file_id] = upload
+                file_content = upload["content"]
+                detected_lang = upload["language"] if language == "auto" else language
+                readable_files.append((uploaded_file.name, file_content, detected_lang))
+
+                with st.expander(f"📄 {uploaded_file.name}", expanded=True):
+                    # Display file info
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("File Size", f"{uploaded_file.size:,} bytes")
+                    with col2:
+                        st.metric("Lines", upload["lines"])
+                    with col3:
+                        st.metric("Language", detected_lang.upper())
+
+                    # Show code preview
+                    st.code(upload["preview"], language=detected_lang, line_numbers=True)
+
+                    # Analysis button for file
+                    if st.button(f"🚀 Analyze {uploaded_file.name}", key=f"analyze_{uploaded_file.name}"):
+                        result = get_analyzer().process_code(
+                            file_content, analysis_mode, detected_lang, translation
+                        )
+                        _record_upload_result(uploaded_file.name, file_content, detected_lang, analysis_mode,
+                                              result, upload["history_preview"])
+                        st.rerun()
+
+                    result = upload_results.get(uploaded_file.name)
+                    if result is None:
+                        pass
+                    elif result.ok:
+                        _show_suspicious(result.suspicious)
+                        st.success("✅ Analysis complete!")
+                        st.markdown(result.text)
+                    else:
+                        _show_suspicious(result.suspicious)
+                        st.error(result.text)
+
+            except UnicodeDecodeError:
+                st.error(
+                    f"❌ Could not read '{uploaded_file.name}'. Please ensure it's a text file with UTF-8 encoding.")
+
+        # Analyze every file at once; same-language files share a request
+        if len(readable_files) > 1 and st.button("🚀 Analyze All Files", type="primary"):
+            results = get_analyzer().process_many(readable_files, analysis_mode, translation)
+
+            for (name, content, lang), result in zip(readable_files, results):
+                _record_upload_result(name, content, lang, analysis_mode, result, _preview(content))
+            st.rerun()
+
+
+def _record_upload_result(name: str, content: str, lang: str, mode: str, result: AnalyzerResult,
+                          code_preview: str):
+    """Keep an uploaded file's result for display and save successful ones to history"""
+    st.session_state.upload_results[name] = result
+    if result.ok:
+        # Save to history; the complete code is stored under code_id
+        history_append({
+            "timestamp": time.time(),
+            "mode": mode,
+            "language": lang,
+            "language_display": lang.upper(),
+            "file": name,
+            "code_id": store_code_snippet(content),
+            "code_preview": code_preview,  # Store preview for display
+            "result": result.text[:MAX_STORED_RESULT_LENGTH]
+        })
+
+
+def _format_timestamp(timestamp: float) -> str:
+    """'YYYY-MM-DDTHH:MM' for a history timestamp"""
+    return datetime.fromtimestamp(timestamp).isoformat(timespec='minutes')
+
+
+def _history_label(items: list):
+    """format_func labelling an index into `items` by timestamp, mode and language"""
+    def label(index: int) -> str:
+        item = items[index]
+        return f"{_format_timestamp(item['timestamp'])} - {item['mode']} ({item.get('language', 'unknown')})"
+    return label
+
+
+@st.fragment
+def _tab_followup(translation: str):
+    """Follow-up Questions tab; its widgets rerun only this fragment"""
+    st.markdown("### Follow-up Questions")
+
+    # Select previous analysis (last 10, newest first)
+    recent_items = history_tail(10)
+    if not recent_items:
+        st.info("📝 Perform a code analysis first to ask follow-up questions.")
+        return
+
+    # Labels are formatted straight from recent_items, the same list indexed below
+    selected_analysis = st.selectbox(
+        "Select previous analysis:",
+        range(len(recent_items)),
+        format_func=_history_label(recent_items)
+    )
+
+    if selected_analysis is None:
+        return
+
+    analysis_item = recent_items[selected_analysis]
+
+    # Show code context
+    with st.expander("📋 Code Context", expanded=False):
+        # Resolve the complete code from the snippet store, not the truncated 'code_preview'
+        complete_code = load_code_snippet(analysis_item.get('code_id'), 'Code not available')
+        st.code(complete_code, language=analysis_item.get('language', 'text'), line_numbers=True)
+
+        # Show code statistics
+        if complete_code != 'Code not available':
+            n_chars, n_lines = _cached_code_stats(analysis_item.get('code_id'), complete_code)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Characters", n_chars)
+            with col2:
+                st.metric("Lines", n_lines)
+            with col3:
+                st.metric("Language", analysis_item['language_display'])
+
+    _followup_panel(analysis_item, translation)
+
+
+@st.fragment
+def _followup_panel(analysis_item: dict, translation: str):
+    """Question box and answer for one history entry; asking reruns only this panel"""
+    # Keys are per history entry so each one gets its own question box
+    item_key = f"{analysis_item['timestamp']}_{analysis_item.get('code_id')}"
+
+    # Follow-up question input; inside a form, typing doesn't rerun anything until submit
+    with st.form(key=f"followup_form_{item_key}", clear_on_submit=True):
+        followup_question = st.text_area(
+            "Your question:",
+            placeholder="e.g., How can I optimize this code for better performance?\nWhat are the potential security issues?\nCan you explain the algorithm used?",
+            height=100,
+            key=f"followup_q_{item_key}"
+        )
+        submitted = st.form_submit_button("💬 Ask Question", type="primary")
+
+    if submitted and followup_question.strip():
+        request_key = hashlib.blake2b(
+            f"{analysis_item.get('code_id')}|{analysis_item.get('language', 'python')}|{translation}|{followup_question}".encode(),
+            digest_size=16
+        ).hexdigest()
+        answered = st.session_state.followup_answer
+        # Re-asking the question just answered keeps that answer on screen instead
+        # of re-running the request and adding a duplicate history entry
+        if not answered or answered.get("request_key") != request_key:
+            _ask_followup(analysis_item, followup_question, translation, request_key)
+
+    elif submitted:
+        st.warning("⚠️ Please enter a question to ask.")
+
+    followup_answer = st.session_state.followup_answer
+    if followup_answer and followup_answer["code_id"] == analysis_item.get('code_id'):
+        _show_suspicious(followup_answer["suspicious"])
+        st.markdown("### 💡 Answer")
+        st.markdown(followup_answer["result"])
+
+
+def _show_suspicious(patterns: Tuple[str, ...]):
+    """Warn next to a result whose code contained suspicious patterns"""
+    if patterns:
+        st.warning("⚠️ Potentially suspicious code patterns detected. Proceed with caution.")
+
+
+def _write_stream(stream: Iterator[str], suspicious: Tuple[str, ...]) -> AnalyzerResult:
+    """Render a process_code_stream generator as it arrives and return the outcome"""
+    # The placeholder is cleared on failure so no half-written answer stays on screen
+    placeholder = st.empty()
+    try:
+        with placeholder:
+            text = st.write_stream(stream)
+    except Exception as e:
+        placeholder.empty()
+        logger.error(f"Error in process_code_stream: {str(e)}")
+        return AnalyzerResult(False, _format_api_error(e), suspicious)
+    return AnalyzerResult(True, text.strip(), suspicious)
+
+
+def _ask_followup(analysis_item: dict, followup_question: str, translation: str, request_key: str):
+    """Answer a follow-up question about a history entry and save it to history"""
+    # Get complete original code from the snippet store
+    original_code = load_code_snippet(analysis_item.get('code_id'))
+    language = analysis_item.get('language') or 'python'
+
+    try:
+        suspicious, stream = get_analyzer().process_code_stream(
+            original_code,
+            "followup",
+            language,
+            translation,
+            followup_question
+        )
+    except AnalysisError as e:
+        st.error(str(e))
+        return
+
+    # Show the answer as it streams in; the rerun below renders it from session state
+    _show_suspicious(suspicious)
+    header = st.empty()
+    header.markdown("### 💡 Answer")
+    result = _write_stream(stream, suspicious)
+
+    if result.ok:
+        # Save follow-up to history; the new entry keeps the snippet in use
+        touch_code_snippet(analysis_item.get('code_id'))
+        history_append({
+            "timestamp": time.time(),
+            "mode": "followup",
+            "language": language,
+            "language_display": language.upper(),
+            "question": followup_question,
+            "code_id": analysis_item.get('code_id'),
+            # Same code as the parent entry, so its preview carries over
+            "code_preview": analysis_item.get('code_preview') or _preview(original_code),
+            "result": result.text[:MAX_STORED_RESULT_LENGTH]
+        })
+
+        # Rerun past this fragment so the tab's history selector lists the new entry
+        st.session_state.followup_answer = {
+            "code_id": analysis_item.get('code_id'),
+            "request_key": request_key,
+            "result": result.text,
+            "suspicious": result.suspicious
+        }
+        st.rerun()
+    else:
+        header.empty()
+        st.error(result.text)
 
 
 def main():
@@ -526,268 +1332,50 @@ def main():
         analysis_mode = st.selectbox(
             "Analysis Mode",
             ["explain", "refactor", "debug", "optimize", "security"],
-            format_func=lambda x: {
-                "explain": "📚 Explain Code",
-                "refactor": "🔧 Refactor Code",
-                "debug": "🐛 Debug Code",
-                "optimize": "⚡ Optimize Performance",
-                "security": "🔒 Security Analysis"
-            }[x]
+            format_func=_MODE_LABELS.__getitem__
         )
 
         language = st.selectbox(
             "Programming Language",
             ["auto", "python", "javascript", "cpp", "java", "html", "css", "php"],
-            format_func=lambda x: {
-                "auto": "🤖 Auto-Detect",
-                "python": "🐍 Python",
-                "javascript": "⚡ JavaScript",
-                "cpp": "⚙️ C++",
-                "java": "☕ Java",
-                "html": "🌐 HTML",
-                "css": "🎨 CSS",
-                "php": "🔷 PHP",
-
-            }[x]
+            format_func=_LANGUAGE_LABELS.__getitem__
         )
 
         translation = st.selectbox(
             "Output Language",
             ["none", "en", "es", "hi", "fr", "de", "zh", "ja"],
-            format_func=lambda x: {
-                "none": "🌍 Original",
-                "en": "🇺🇸 English",
-                "es": "🇪🇸 Spanish",
-                "hi": "🇮🇳 Hindi",
-                "fr": "🇫🇷 French",
-                "de": "🇩🇪 German",
-                "zh": "🇨🇳 Chinese",
-                "ja": "🇯🇵 Japanese"
-            }[x]
+            format_func=_TRANSLATION_LABELS.__getitem__
+        )
+
+        # Bounded by MAX_HISTORY_ITEMS; lowering it trims the stored history right away
+        st.slider(
+            "History Size",
+            min_value=5,
+            max_value=MAX_HISTORY_ITEMS,
+            value=MAX_HISTORY_ITEMS,
+            step=5,
+            key="max_history",
+            on_change=_trim_history,
+            help="Number of past analyses to keep"
         )
 
         st.divider()
 
         # Statistics
 
-    # Main Content Tabs
+    # Main Content Tabs; each body is a fragment so interacting with one tab
+    # doesn't re-run the others
     tab1, tab2, tab3 = st.tabs(["📝 Code Analysis", "📁 File Upload", "💬 Follow-up Questions"])
 
     with tab1:
-        st.markdown("### Code Input")
-
-        # Code input area
-        code_input = st.text_area(
-            "Paste your code here:",
-            height=300,
-            placeholder="# Enter your code here...\nprint('Hello, World!')",
-            help="Paste or type your code for analysis"
-        )
-
-        # Analysis button (removed example button and column layout)
-        analyze_btn = st.button("🚀 Analyze Code", type="primary", use_container_width=True)
-
-        # Perform analysis
-        if analyze_btn and code_input.strip():
-            # Detect language if auto-detect is selected
-            detected_lang = language
-            if language == "auto":
-                detected_lang = st.session_state.analyzer.detect_language(code_input)
-
-            # Save snippet if requested
-
-            # Perform analysis
-            result = st.session_state.analyzer.process_code(
-                code_input, analysis_mode, detected_lang, translation
-            )
-
-            # Display results
-            if not result.startswith("❌"):
-                st.markdown("""
-                <div class="analysis-header">
-                    <h3>💡 Analysis Result</h3>
-                    <p>AI-powered code analysis complete</p>
-                </div>
-                """, unsafe_allow_html=True)
-
-                st.markdown(result)
-
-                # Save to history - FIXED: Store complete code instead of truncated
-                st.session_state.analysis_history.append({
-                    "timestamp": datetime.now().isoformat(),
-                    "mode": analysis_mode,
-                    "language": detected_lang,
-                    "code": code_input,  # Store complete code
-                    "code_preview": code_input[:200] + "..." if len(code_input) > 200 else code_input,
-                    # Store preview for display
-                    "result": result
-                })
-
-                # Download option
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.download_button(
-                        "📥 Download Analysis",
-                        data=f"# Code Analysis Report\n\n## Code:\n```{detected_lang}\n{code_input}\n```\n\n## Analysis:\n{result}",
-                        file_name=f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                        mime="text/markdown"
-                    )
-                with col2:
-                    if st.button("🔄 Analyze Again"):
-                        st.rerun()
-            else:
-                st.error(result)
-
-        elif analyze_btn:
-            st.warning("⚠️ Please enter some code to analyze.")
+        _tab_code_analysis(analysis_mode, language, translation)
 
     with tab2:
-        st.markdown("### File Upload")
-        st.info("📁 Upload code files for analysis. Supported formats: " + ", ".join(ALLOWED_EXTENSIONS))
-
-        uploaded_files = st.file_uploader(
-            "Choose code files",
-            accept_multiple_files=True,
-            type=list(ext.replace('.', '') for ext in ALLOWED_EXTENSIONS)
-        )
-
-        if uploaded_files:
-            for uploaded_file in uploaded_files:
-                if uploaded_file.size > MAX_FILE_SIZE:
-                    st.error(f"❌ File '{uploaded_file.name}' is too large (max {MAX_FILE_SIZE // 1024 // 1024}MB)")
-                    continue
-
-                try:
-                    file_content = uploaded_file.read().decode('utf-8')
-
-                    with st.expander(f"📄 {uploaded_file.name}", expanded=True):
-                        # Display file info
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("File Size", f"{uploaded_file.size:,} bytes")
-                        with col2:
-                            st.metric("Lines", len(file_content.split('\n')))
-                        with col3:
-                            # Pass filename for better detection
-                            if language == "auto":
-                                detected_lang = st.session_state.analyzer.detect_language(file_content,
-                                                                                          uploaded_file.name)
-                            else:
-                                detected_lang = language
-                            st.metric("Language", detected_lang.upper())
-
-                        # Show code preview
-                        st.code(file_content[:1000] + "..." if len(file_content) > 1000 else file_content,
-                                language=detected_lang)
-
-                        # Analysis button for file
-                        if st.button(f"🚀 Analyze {uploaded_file.name}", key=f"analyze_{uploaded_file.name}"):
-                            # Pass filename to detect_language for better detection
-                            if language == "auto":
-                                detected_lang = st.session_state.analyzer.detect_language(file_content,
-                                                                                          uploaded_file.name)
-                            else:
-                                detected_lang = language
-
-                            result = st.session_state.analyzer.process_code(
-                                file_content, analysis_mode, detected_lang, translation
-                            )
-
-                            if not result.startswith("❌"):
-                                st.success("✅ Analysis complete!")
-                                st.markdown(result)
-
-                                # Save to history - FIXED: Store complete code instead of truncated
-                                st.session_state.analysis_history.append({
-                                    "timestamp": datetime.now().isoformat(),
-                                    "mode": analysis_mode,
-                                    "language": detected_lang,
-                                    "file": uploaded_file.name,
-                                    "code": file_content,  # Store complete code
-                                    "code_preview": file_content[:200] + "...",  # Store preview for display
-                                    "result": result
-                                })
-                            else:
-                                st.error(result)
-
-                except UnicodeDecodeError:
-                    st.error(
-                        f"❌ Could not read '{uploaded_file.name}'. Please ensure it's a text file with UTF-8 encoding.")
+        _tab_file_upload(analysis_mode, language, translation)
 
     with tab3:
-        st.markdown("### Follow-up Questions")
-
-        if not st.session_state.analysis_history:
-            st.info("📝 Perform a code analysis first to ask follow-up questions.")
-        else:
-            # Select previous analysis
-            analysis_options = [
-                f"{item['timestamp'][:16]} - {item['mode']} ({item.get('language', 'unknown')})"
-                for item in reversed(st.session_state.analysis_history[-10:])  # Last 10 analyses
-            ]
-
-            selected_analysis = st.selectbox(
-                "Select previous analysis:",
-                range(len(analysis_options)),
-                format_func=lambda x: analysis_options[x]
-            )
-
-            if selected_analysis is not None:
-                analysis_item = list(reversed(st.session_state.analysis_history[-10:]))[selected_analysis]
-
-                # Show code context - FIXED: Display complete code, not truncated
-                with st.expander("📋 Code Context", expanded=False):
-                    # Use the complete code stored in 'code' field instead of truncated 'code_preview'
-                    complete_code = analysis_item.get('code', 'Code not available')
-                    st.code(complete_code, language=analysis_item.get('language', 'text'))
-
-                    # Show code statistics
-                    if complete_code != 'Code not available':
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Characters", len(complete_code))
-                        with col2:
-                            st.metric("Lines", len(complete_code.split('\n')))
-                        with col3:
-                            st.metric("Language", analysis_item.get('language', 'unknown').upper())
-
-                # Follow-up question input
-                followup_question = st.text_area(
-                    "Your question:",
-                    placeholder="e.g., How can I optimize this code for better performance?\nWhat are the potential security issues?\nCan you explain the algorithm used?",
-                    height=100
-                )
-
-                if st.button("💬 Ask Question", type="primary") and followup_question.strip():
-                    # Get complete original code from history
-                    original_code = analysis_item.get('code', '')
-
-                    result = st.session_state.analyzer.process_code(
-                        original_code,
-                        "followup",
-                        analysis_item.get('language', 'python'),
-                        translation,
-                        followup_question
-                    )
-
-                    if not result.startswith("❌"):
-                        st.markdown("### 💡 Answer")
-                        st.markdown(result)
-
-                        # Save follow-up to history
-                        st.session_state.analysis_history.append({
-                            "timestamp": datetime.now().isoformat(),
-                            "mode": "followup",
-                            "language": analysis_item.get('language', 'python'),
-                            "question": followup_question,
-                            "code": original_code,  # Store complete code
-                            "code_preview": original_code[:200] + "..." if len(original_code) > 200 else original_code,
-                            "result": result
-                        })
-                    else:
-                        st.error(result)
+        _tab_followup(translation)
 
 
 if __name__ == "__main__":
     main()
-